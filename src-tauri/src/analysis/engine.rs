@@ -22,6 +22,33 @@ pub struct UpdateDiagnostics {
     pub alpha: f64,
 }
 
+/// HMM 前向きアルゴリズムの1ステップ: 予測 (遷移) → 観測尤度の乗算 → 正規化。
+/// update() / update_silence() の両経路で共有する。
+///
+/// `transitions_t`: 転置済み遷移行列 (transitions_t[to][from])。
+///   遷移先 j への予測確率は transitions_t[j] と probs の内積となり、連続した1行で済む。
+/// `emit`: 今回の観測ビンにおける各状態の放射確率
+///
+/// 合計が0になった場合は以前の確率を維持する (フォールバック)。
+///
+/// 状態数は3で固定のため、ループを使わずスカラー演算に展開している
+/// (行列積 9 乗算 + 放射確率 3 乗算 + 正規化)。
+#[inline]
+fn forward_step(transitions_t: &[[f64; 3]; 3], emit: &[f64; 3], probs: &[f64; 3]) -> [f64; 3] {
+    let [p0, p1, p2] = *probs;
+    let [t0, t1, t2] = transitions_t;
+
+    let l0 = (t0[0] * p0 + t0[1] * p1 + t0[2] * p2) * emit[0];
+    let l1 = (t1[0] * p0 + t1[1] * p1 + t1[2] * p2) * emit[1];
+    let l2 = (t2[0] * p0 + t2[1] * p1 + t2[2] * p2) * emit[2];
+
+    let sum_prob = l0 + l1 + l2;
+    if sum_prob <= 0.0 {
+        return *probs;
+    }
+    [l0 / sum_prob, l1 / sum_prob, l2 / sum_prob]
+}
+
 #[derive(Debug, Clone, Copy, PartialEq, Eq, Hash)]
 pub enum CognitiveState {
     Flow,
@@ -32,7 +59,8 @@ pub enum CognitiveState {
 #[derive(Clone)]
 pub struct CognitiveStateEngine {
     // Manual HMM parameters
-    transitions: Arc<[f64; 9]>,
+    // 転置して保持する (transitions_t[to][from])。定義は new() の行優先リテラルを参照。
+    transitions_t: Arc<[[f64; 3]; 3]>,
 
     // 3 states × 26 observation bins
     //   obs = x_bin * 5 + y_bin  (0..24 natural bins)
@@ -40,7 +68,10 @@ pub struct CognitiveStateEngine {
     //
     // X-axis (Friction):   0 = low friction  … 4 = high friction
     // Y-axis (Engagement): 0 = low engagement … 4 = high engagement
-    emissions: Arc<[f64; 78]>,
+    //
+    // 観測ビンごとに3状態分の放射確率を連続配置する (obs-major: emissions[obs][state])。
+    // 前向き更新では観測 obs の1行を読むだけで済む。
+    emissions: Arc<[[f64; 3]; 26]>,
 
     current_state_probs: Arc<Mutex<[f64; 3]>>,
     pub is_paused: Arc<AtomicBool>,
@@ -144,6 +175,22 @@ impl CognitiveStateEngine {
                                0.99,
         ];
 
+        // 前向き更新は遷移先ごとに列を読むため、行優先の定義を一度だけ転置しておく
+        let mut transitions_t = [[0.0; 3]; 3];
+        for (to, row) in transitions_t.iter_mut().enumerate() {
+            for (from, t_prob) in row.iter_mut().enumerate() {
+                *t_prob = transitions[from * 3 + to];
+            }
+        }
+
+        // 状態ごとの定義 (上表) を観測ビンごとの行に並べ替える
+        let mut emissions_by_obs = [[0.0; 3]; 26];
+        for (obs, row) in emissions_by_obs.iter_mut().enumerate() {
+            for (j, e_prob) in row.iter_mut().enumerate() {
+                *e_prob = emissions[j * 26 + obs];
+            }
+        }
+
         // 初期事前確率: Flow優勢で開始 (セッション開始直後のフリッカー防止)
         // 最初の1-2秒はサイレンス観測(f1=2000)が流入し Incubation 方向に引っ張るが、
         // Flow優勢の事前確率がこの過渡的ノイズを吸収する。
@@ -151,8 +198,8 @@ impl CognitiveStateEngine {
         let initial_probs = [0.80, 0.15, 0.05];
 
         Self {
-            transitions: Arc::new(transitions),
-            emissions: Arc::new(emissions),
+            transitions_t: Arc::new(transitions_t),
+            emissions: Arc::new(emissions_by_obs),
             current_state_probs: Arc::new(Mutex::new(initial_probs)),
             is_paused: Arc::new(AtomicBool::new(false)),
             backspace_streak: Arc::new(AtomicU32::new(0)),
@@ -317,7 +364,37 @@ impl CognitiveStateEngine {
 
         // EWMA平滑化 (α = 0.3): 各軸を独立に平滑化
         // s_t = 0.3 * raw_t + 0.7 * s_{t-1}
-        let alpha = 0.3;
+        Some(self.advance(raw_x, raw_y, 0.3, apply_backspace_penalty))
+    }
+
+    /// 無入力期間（サイレンス）用のHMM更新。
+    /// 通常の `update()` (α=0.3) と異なり、沈黙の深さに応じた動的αでEWMAを更新する。
+    ///   - silence_secs < 15.0: α=0.15 (時定数 ≈ 6.6秒)
+    ///   - silence_secs >= 15.0: α=0.25 (時定数 ≈ 4秒、深い沈黙でStuck到達を加速)
+    pub fn update_silence(&self, features: &Features, ime_open: bool, silence_secs: f64) -> Option<UpdateDiagnostics> {
+        if self.get_paused() {
+            return None;
+        }
+
+        let (raw_x, raw_y) = self.calculate_latent_axes(features, ime_open);
+
+        // 沈黙の深さに応じた動的α:
+        //   α=0.15 (silence < 15s): 通常の沈黙。時定数 ≈ 6.6秒。
+        //   α=0.25 (silence >= 15s): 深い沈黙。時定数 ≈ 4秒。
+        //     F3/F6 の摩擦フロア (lib.rs Fix 6) と連携し、
+        //     20秒の沈黙で x_bin=4 (Stuck領域) に確実に到達する。
+        let alpha = if silence_secs >= 15.0 { 0.25 } else { 0.15 };
+        // サイレンス中はペナルティビンを適用しない
+        Some(self.advance(raw_x, raw_y, alpha, false))
+    }
+
+    /// update() / update_silence() 共通の1ステップ:
+    /// EWMA平滑化 → 観測ビン選択 → 前向き更新 → ヒステリシス層 を1回の流れで行う。
+    ///
+    /// `alpha`: 今回の EWMA 係数
+    /// `apply_backspace_penalty`: true ならペナルティビン (obs=25) を強制し、
+    ///   ヒステリシス層も高速側の α=0.60 を使う
+    fn advance(&self, raw_x: f64, raw_y: f64, alpha: f64, apply_backspace_penalty: bool) -> UpdateDiagnostics {
         let one_minus_alpha = 1.0 - alpha;
         let (x, y) = match self.axes_ewma.lock() {
             Ok(mut ewma) => {
@@ -359,35 +436,10 @@ impl CognitiveStateEngine {
             Err(poisoned) => poisoned.into_inner(),
         };
 
-        let old_probs = *current;
-        let mut new_probs = [0.0; 3];
-        let n_states = 3;
-
         // Forward Algorithm Step
         // 放射確率は emission テーブルに最小値 0.01 を組み込み済み。
         // 旧 EMISSION_FLOOR (+0.05 一律加算) は廃止。
-        let mut sum_prob = 0.0;
-
-        for j in 0..n_states {
-            let mut trans_sum = 0.0;
-            for i in 0..n_states {
-                let t_prob = self.transitions[i * n_states + j];
-                trans_sum += old_probs[i] * t_prob;
-            }
-
-            // 3 states × 26 bins: index = j * 26 + obs
-            let e_prob = self.emissions[j * 26 + obs];
-            new_probs[j] = trans_sum * e_prob;
-            sum_prob += new_probs[j];
-        }
-
-        // Normalize
-        if sum_prob > 0.0 {
-            for j in 0..n_states {
-                new_probs[j] /= sum_prob;
-            }
-        }
-        // 合計が0になった場合は以前の確率を維持する (フォールバック)
+        let new_probs = forward_step(&self.transitions_t, &self.emissions[obs], &current);
 
         *current = new_probs;
         // NOTE: current_state_probs のガードを display_probs 取得前に解放する。
@@ -409,7 +461,7 @@ impl CognitiveStateEngine {
             Err(poisoned) => poisoned.into_inner(),
         };
         let mut disp_sum = 0.0;
-        for i in 0..n_states {
+        for i in 0..3 {
             display[i] = display_alpha * new_probs[i] + (1.0 - display_alpha) * display[i];
             disp_sum += display[i];
         }
@@ -419,113 +471,24 @@ impl CognitiveStateEngine {
             }
         }
 
-        Some(diagnostics)
+        diagnostics
     }
 
-    /// 無入力期間（サイレンス）用のHMM更新。
-    /// 通常の `update()` (α=0.3) と異なり、沈黙の深さに応じた動的αでEWMAを更新する。
-    ///   - silence_secs < 15.0: α=0.15 (時定数 ≈ 6.6秒)
-    ///   - silence_secs >= 15.0: α=0.25 (時定数 ≈ 4秒、深い沈黙でStuck到達を加速)
-    pub fn update_silence(&self, features: &Features, ime_open: bool, silence_secs: f64) -> Option<UpdateDiagnostics> {
-        if self.get_paused() {
-            return None;
-        }
-
-        let (raw_x, raw_y) = self.calculate_latent_axes(features, ime_open);
-
-        // 沈黙の深さに応じた動的α:
-        //   α=0.15 (silence < 15s): 通常の沈黙。時定数 ≈ 6.6秒。
-        //   α=0.25 (silence >= 15s): 深い沈黙。時定数 ≈ 4秒。
-        //     F3/F6 の摩擦フロア (lib.rs Fix 6) と連携し、
-        //     20秒の沈黙で x_bin=4 (Stuck領域) に確実に到達する。
-        let alpha = if silence_secs >= 15.0 { 0.25 } else { 0.15 };
-        let one_minus_alpha = 1.0 - alpha;
-        let (x, y) = match self.axes_ewma.lock() {
-            Ok(mut ewma) => {
-                ewma.0 = alpha * raw_x + one_minus_alpha * ewma.0;
-                ewma.1 = alpha * raw_y + one_minus_alpha * ewma.1;
-                (ewma.0, ewma.1)
-            }
-            Err(poisoned) => {
-                let mut ewma = poisoned.into_inner();
-                ewma.0 = alpha * raw_x + one_minus_alpha * ewma.0;
-                ewma.1 = alpha * raw_y + one_minus_alpha * ewma.1;
-                (ewma.0, ewma.1)
-            }
-        };
-        let x_bin = (x * 5.0).floor().min(4.0) as usize;
-        let y_bin = (y * 5.0).floor().min(4.0) as usize;
-        let obs = x_bin * 5 + y_bin;
-
-        let diagnostics = UpdateDiagnostics {
-            raw_x,
-            raw_y,
-            ewma_x: x,
-            ewma_y: y,
-            obs,
-            alpha,
-        };
-
-        // サイレンス中はペナルティビンを適用しない
-
-        let mut current = match self.current_state_probs.lock() {
-            Ok(g) => g,
-            Err(poisoned) => poisoned.into_inner(),
-        };
-
-        let old_probs = *current;
-        let mut new_probs = [0.0; 3];
-        let n_states = 3;
-
-        let mut sum_prob = 0.0;
-        for j in 0..n_states {
-            let mut trans_sum = 0.0;
-            for i in 0..n_states {
-                let t_prob = self.transitions[i * n_states + j];
-                trans_sum += old_probs[i] * t_prob;
-            }
-            let e_prob = self.emissions[j * 26 + obs];
-            new_probs[j] = trans_sum * e_prob;
-            sum_prob += new_probs[j];
-        }
-
-        if sum_prob > 0.0 {
-            for j in 0..n_states {
-                new_probs[j] /= sum_prob;
-            }
-        }
-
-        *current = new_probs;
-        // NOTE: current_state_probs のガードを display_probs 取得前に解放する。
-        drop(current);
-
-        // Hysteresis Layer (通常のα=0.40)
-        let mut display = match self.display_probs.lock() {
-            Ok(g) => g,
-            Err(poisoned) => poisoned.into_inner(),
-        };
-        let mut disp_sum = 0.0;
-        for i in 0..n_states {
-            display[i] = 0.40 * new_probs[i] + 0.60 * display[i];
-            disp_sum += display[i];
-        }
-        if disp_sum > 0.0 {
-            for v in display.iter_mut() {
-                *v /= disp_sum;
-            }
+    /// 表示用確率 [Flow, Incubation, Stuck] のスナップショットを返す。
+    /// display_probs (ヒステリシス層) の値をコピーして即座にガードを解放する。
+    /// ヒープ確保を伴わないため、1Hz のログ出力など高頻度の読み出しはこちらを使う。
+    pub fn display_probs(&self) -> [f64; 3] {
+        match self.display_probs.lock() {
+            Ok(g) => *g,
+            Err(poisoned) => *poisoned.into_inner(),
         }
-
-        Some(diagnostics)
     }
 
     pub fn get_current_state(&self) -> HashMap<CognitiveState, f64> {
         // display_probs (ヒステリシス層) を返す。
         // 生の current_state_probs は瞬間値; display_probs は遅い EMA により
         // 短期スパイクを平滑化した値。UI・ログはこちらを使用する。
-        let probs = match self.display_probs.lock() {
-            Ok(g) => g,
-            Err(poisoned) => poisoned.into_inner(),
-        };
+        let probs = self.display_probs();
         let mut map = HashMap::new();
         map.insert(CognitiveState::Flow, probs[0]);
         map.insert(CognitiveState::Incubation, probs[1]);
@@ -17,7 +17,8 @@ pub struct InputEvent {
 }
 
 /// B-1: 5特徴量を格納する構造体 (F1,F3,F4,F5,F6; F2は未使用のため削除)
-#[derive(Debug, Clone)]
+/// f64 × 5 の値型。キャッシュ・ログ出力への受け渡しはビットコピーで済ませる。
+#[derive(Debug, Clone, Copy, Default)]
 pub struct Features {
     /// F1: Flight Time 中央値 (ms)
     pub f1_flight_time_median: f64,
@@ -31,18 +32,6 @@ pub struct Features {
     pub f6_pause_after_del_rate: f64,
 }
 
-impl Default for Features {
-    fn default() -> Self {
-        Self {
-            f1_flight_time_median: 0.0,
-            f3_correction_rate: 0.0,
-            f4_burst_length: 0.0,
-            f5_pause_count: 0.0,
-            f6_pause_after_del_rate: 0.0,
-        }
-    }
-}
-
 /// B-2: 個人ベースライン正規化関数 φ(x, β) = clamp((x − β) / (κ · β), 0.0, 1.0)
 /// κ = 2.0
 pub fn phi(x: f64, beta: f64) -> f64 {
@@ -53,9 +42,151 @@ pub fn phi(x: f64, beta: f64) -> f64 {
     ((x - beta) / (KAPPA * beta)).clamp(0.0, 1.0)
 }
 
+/// 特徴量の算出ウィンドウ長 (ms)
+const WINDOW_MS: u64 = 30_000;
+
+/// フライトタイムの上限 (ms)。これ以上の間隔はポーズとして F1 から除外する。
+const MAX_FLIGHT_MS: u64 = 2000;
+
+/// バースト (F4) を継続させるフライトタイムの上限 (ms, 未満)
+const BURST_FT_MS: u64 = 200;
+
+/// ウィンドウ内フライトタイムの中央値を保持する度数木 (Fenwick tree)。
+///
+/// フライトタイムは 0..MAX_FLIGHT_MS の整数 (ms) なので、1ms 刻みの度数分布として持てば
+/// 挿入・削除・k 番目の値の探索がいずれも O(log 2048) で済む。
+/// calculate_features() ごとのコピーとソートが不要になる。
+struct FlightTimeMedian {
+    /// 1-indexed (index = ft + 1)
+    tree: Vec<u32>,
+    len: usize,
+}
+
+impl FlightTimeMedian {
+    /// MAX_FLIGHT_MS 以上の2の冪 (k 番目探索の二分降下に使う)
+    const SIZE: usize = 2048;
+
+    fn new() -> Self {
+        Self {
+            tree: vec![0; Self::SIZE + 1],
+            len: 0,
+        }
+    }
+
+    fn clear(&mut self) {
+        self.tree.fill(0);
+        self.len = 0;
+    }
+
+    fn insert(&mut self, ft: u64) {
+        debug_assert!(ft < MAX_FLIGHT_MS, "flight time {} out of range", ft);
+        let mut i = ft as usize + 1;
+        while i <= Self::SIZE {
+            self.tree[i] += 1;
+            i += i & i.wrapping_neg();
+        }
+        self.len += 1;
+    }
+
+    fn remove(&mut self, ft: u64) {
+        let mut i = ft as usize + 1;
+        while i <= Self::SIZE {
+            self.tree[i] -= 1;
+            i += i & i.wrapping_neg();
+        }
+        self.len -= 1;
+    }
+
+    /// 小さい方から k 番目 (0-indexed) の値
+    fn kth(&self, k: usize) -> u64 {
+        let mut pos = 0;
+        let mut rank = k as u32 + 1;
+        let mut step = Self::SIZE;
+        while step > 0 {
+            let next = pos + step;
+            if next <= Self::SIZE && self.tree[next] < rank {
+                pos = next;
+                rank -= self.tree[next];
+            }
+            step >>= 1;
+        }
+        pos as u64
+    }
+
+    /// bound 未満の値の個数
+    fn count_below(&self, bound: u64) -> usize {
+        let mut i = (bound as usize).min(Self::SIZE);
+        let mut count = 0;
+        while i > 0 {
+            count += self.tree[i] as usize;
+            i &= i - 1;
+        }
+        count
+    }
+
+    fn median(&self) -> Option<f64> {
+        let len = self.len;
+        if len == 0 {
+            None
+        } else if len % 2 == 0 {
+            Some((self.kth(len / 2 - 1) + self.kth(len / 2)) as f64 / 2.0)
+        } else {
+            Some(self.kth(len / 2) as f64)
+        }
+    }
+}
+
+/// キー押下1回分の記録。F5/F6 用のプレフィックス和を保持する。
+///
+/// 累積値は「この押下で終わる押下ペア」までを含むため、
+/// ウィンドウ内のペア数は `末尾の累積値 − 先頭の累積値` の減算1回で求まる。
+#[derive(Debug, Clone, Copy)]
+struct PressMark {
+    timestamp: u64,
+    is_backspace: bool,
+    /// 2秒以上の押下間隔の累積数 (F5)
+    cum_pauses: u64,
+    /// 上記のうち直前の押下が BS/Del だったものの累積数 (F6)
+    cum_del_pauses: u64,
+}
+
+/// 30秒スライディングウィンドウ上の特徴量抽出器。
+///
+/// ウィンドウはイベント到着時にインクリメンタルに更新する:
+///   右端: process_event() で新イベントを取り込み、集計値を加算
+///   左端: 30秒より古いイベント (および容量超過分) を追い出し、集計値を減算
+/// calculate_features() はバッファ全体の再走査・再フィルタを行わない。
+///
+/// 追い出しは到着順に先頭からのみ行う。タイムスタンプは SystemTime 由来のため
+/// 時計の補正で逆行しうるが、その場合も途中のイベントを時刻で間引くことはしない。
+/// (ウィンドウ内の全イベントを `timestamp >= cutoff` で絞り込む旧実装とは、
+/// タイムスタンプが逆行したときに限り F3〜F6 の値が異なりうる。)
 pub struct FeatureExtractor {
     buffer: VecDeque<InputEvent>,
     capacity: usize,
+    /// 次に取り込むイベントの通し番号。
+    /// バッファ先頭の通し番号は `next_seq - buffer.len()` で求まる。
+    next_seq: u64,
+    /// 直近のリリースイベント (通し番号, タイムスタンプ)
+    last_release: Option<(u64, u64)>,
+    /// ウィンドウ内のフライトタイム (基準リリースの通し番号, FT ms)。
+    /// 基準リリースがウィンドウ外に出た時点で先頭から破棄する。
+    flight_times: VecDeque<(u64, u64)>,
+    /// flight_times の中央値 (F1)
+    ft_median: FlightTimeMedian,
+    /// 直前のリリースより時刻が戻った押下の基準リリース通し番号。
+    /// flight_times には入らないが F4 ではバースト継続 (FT=0) と数えられるため別に持つ。
+    backward_flights: VecDeque<u64>,
+    /// ウィンドウ内のキー押下 (buffer 中の押下イベントと1対1に対応)
+    presses: VecDeque<PressMark>,
+    /// 直近のキー押下。ウィンドウから追い出された後も累積値の起点として保持する。
+    last_press: Option<PressMark>,
+    /// ウィンドウ内の BS/Del 押下数
+    correction_count: usize,
+    /// 直近の calculate_features() の結果。
+    /// ウィンドウはイベント到着時にしか動かないため、
+    /// 次の process_event() / reset() までは無入力中の 1Hz 呼び出しに再利用できる。
+    cached: Option<Features>,
 }
 
 impl FeatureExtractor {
@@ -63,6 +194,15 @@ impl FeatureExtractor {
         Self {
             buffer: VecDeque::with_capacity(capacity),
             capacity,
+            next_seq: 0,
+            last_release: None,
+            flight_times: VecDeque::with_capacity(capacity),
+            ft_median: FlightTimeMedian::new(),
+            backward_flights: VecDeque::new(),
+            presses: VecDeque::with_capacity(capacity),
+            last_press: None,
+            correction_count: 0,
+            cached: None,
         }
     }
 
@@ -70,106 +210,202 @@ impl FeatureExtractor {
     /// セッション開始時に呼び出され、前回セッションのデータを破棄する。
     pub fn reset(&mut self) {
         self.buffer.clear();
+        self.next_seq = 0;
+        self.last_release = None;
+        self.flight_times.clear();
+        self.ft_median.clear();
+        self.backward_flights.clear();
+        self.presses.clear();
+        self.last_press = None;
+        self.correction_count = 0;
+        self.cached = None;
     }
 
     pub fn process_event(&mut self, event: InputEvent) {
-        if self.buffer.len() >= self.capacity {
-            self.buffer.pop_front();
-        }
-        self.buffer.push_back(event);
-    }
-
-    /// B-1: 直近30秒のバッファから5特徴量を算出する
-    pub fn calculate_features(&self) -> Features {
-        if self.buffer.is_empty() {
-            return Features::default();
-        }
-
-        let last_ts = self.buffer.back().unwrap().timestamp;
-        let cutoff = last_ts.saturating_sub(30_000);
+        self.cached = None;
 
-        // 直近30秒のイベントを収集
-        let events: Vec<&InputEvent> = self.buffer.iter()
-            .filter(|e| e.timestamp >= cutoff)
-            .collect();
-
-        if events.is_empty() {
-            return Features::default();
-        }
+        // --- 右端: 新イベントを取り込む ---
+        let seq = self.next_seq;
+        self.next_seq += 1;
 
-        // --- ウィンドウ内のフライトタイムを計算 (直近30秒) ---
         // キーリピートを除外して flight time を算出する。
         // 非タイピングキーはフック層で既にフィルタ済みのため、ここではチェック不要。
-        let mut window_fts: Vec<f64> = Vec::new();
-        let mut last_release: Option<u64> = None;
-        for event in &events {
-            if event.is_repeat {
-                continue;
+        if event.is_press {
+            self.push_press(event);
+            if event.is_backspace {
+                self.correction_count += 1;
             }
-            if event.is_press {
-                if let Some(rel) = last_release {
-                    if event.timestamp >= rel {
-                        let ft = (event.timestamp - rel) as f64;
-                        if ft < 2000.0 {
-                            window_fts.push(ft);
+            if !event.is_repeat {
+                if let Some((rel_seq, rel_ts)) = self.last_release {
+                    if event.timestamp >= rel_ts {
+                        let ft = event.timestamp - rel_ts;
+                        if ft < MAX_FLIGHT_MS {
+                            self.flight_times.push_back((rel_seq, ft));
+                            self.ft_median.insert(ft);
                         }
+                    } else {
+                        self.backward_flights.push_back(rel_seq);
                     }
                 }
-            } else {
-                last_release = Some(event.timestamp);
             }
+        } else if !event.is_repeat {
+            self.last_release = Some((seq, event.timestamp));
         }
+        self.buffer.push_back(event);
 
-        // --- F1: Flight Time 中央値 (直近30秒ウィンドウ) ---
-        let f1 = if window_fts.is_empty() {
-            0.0
-        } else {
-            window_fts.sort_unstable_by(|a, b| a.partial_cmp(b).unwrap_or(std::cmp::Ordering::Equal));
-            let len = window_fts.len();
-            if len % 2 == 0 {
-                (window_fts[len / 2 - 1] + window_fts[len / 2]) / 2.0
-            } else {
-                window_fts[len / 2]
+        // --- 左端: 容量超過分と30秒より古いイベントを追い出す ---
+        // 先頭が cutoff 以降なら止める (到着順のウィンドウ。構造体のドキュメント参照)
+        let cutoff = event.timestamp.saturating_sub(WINDOW_MS);
+        while self.buffer.len() > self.capacity
+            || self.buffer.front().map_or(false, |e| e.timestamp < cutoff)
+        {
+            if let Some(old) = self.buffer.pop_front() {
+                if old.is_press {
+                    self.presses.pop_front();
+                    if old.is_backspace {
+                        self.correction_count -= 1;
+                    }
+                }
+            }
+        }
+
+        // 基準リリースがウィンドウ外に出たフライトタイムを破棄する
+        let front_seq = self.next_seq - self.buffer.len() as u64;
+        while let Some(&(rel_seq, ft)) = self.flight_times.front() {
+            if rel_seq >= front_seq {
+                break;
+            }
+            self.flight_times.pop_front();
+            self.ft_median.remove(ft);
+        }
+        while self.backward_flights.front().map_or(false, |&rel_seq| rel_seq < front_seq) {
+            self.backward_flights.pop_front();
+        }
+    }
+
+    /// キー押下を記録し、直前の押下との間隔から F5/F6 の累積値を進める。
+    /// 直前の押下がウィンドウ外でも累積値は進めてよい: そのペアは
+    /// 先頭の累積値に含まれるため、ウィンドウ内の差分には現れない。
+    fn push_press(&mut self, event: InputEvent) {
+        let mark = match self.last_press {
+            Some(prev) => {
+                let long_pause = event.timestamp.saturating_sub(prev.timestamp) >= 2000;
+                PressMark {
+                    timestamp: event.timestamp,
+                    is_backspace: event.is_backspace,
+                    cum_pauses: prev.cum_pauses + long_pause as u64,
+                    cum_del_pauses: prev.cum_del_pauses + (long_pause && prev.is_backspace) as u64,
+                }
             }
+            None => PressMark {
+                timestamp: event.timestamp,
+                is_backspace: event.is_backspace,
+                cum_pauses: 0,
+                cum_del_pauses: 0,
+            },
         };
+        self.presses.push_back(mark);
+        self.last_press = Some(mark);
+    }
+
+    /// B-1: 直近30秒のバッファから5特徴量を算出する
+    ///
+    /// 前回の呼び出し以降にイベントが到着していなければ、前回の結果をそのまま返す。
+    pub fn calculate_features(&mut self) -> Features {
+        if let Some(cached) = self.cached {
+            return cached;
+        }
+        let features = self.compute_features();
+        self.cached = Some(features);
+        features
+    }
 
-        // --- キー押下イベントのみ抽出 ---
-        let press_events: Vec<&&InputEvent> = events.iter()
-            .filter(|e| e.is_press)
-            .collect();
+    fn compute_features(&self) -> Features {
+        // process_event() で30秒より古いイベントは追い出し済みのため、
+        // バッファ全体がそのまま直近30秒のウィンドウとなる。
+        // 押下が無ければフライトタイムも無く、5特徴量はすべて 0 になる
+        // (リリースだけが残ったウィンドウも含む)。
+        if self.presses.is_empty() {
+            return Features::default();
+        }
 
-        let total_keys = press_events.len();
+        // --- F1: Flight Time 中央値 (直近30秒ウィンドウ) ---
+        let f1 = self.ft_median.median().unwrap_or(0.0);
 
         // --- F3: 修正率 = (BS + Del) / 全キー押下数 ---
-        let correction_keys = press_events.iter()
-            .filter(|e| e.is_backspace)
-            .count();
+        let f3 = self.correction_count as f64 / self.presses.len() as f64;
+
+        // --- F4: バースト長 = 連続FT<200ms のチャンクの平均文字数 ---
+        let f4 = if self.bursts_all_single() {
+            1.0
+        } else {
+            self.mean_burst_length()
+        };
 
-        let f3 = if total_keys > 0 {
-            correction_keys as f64 / total_keys as f64
+        // --- F5: ポーズ回数 = 連続キー押下間で2秒以上の間隔の数 ---
+        // --- F6: 削除後停止率 = BS/Del直後に2秒以上停止する割合 ---
+        // 押下ペアの計数はプレフィックス和の差分で求める (push_press 参照)
+        let (pauses, del_followed_by_pause) = match (self.presses.front(), self.presses.back()) {
+            (Some(first), Some(last)) => (
+                last.cum_pauses - first.cum_pauses,
+                last.cum_del_pauses - first.cum_del_pauses,
+            ),
+            _ => (0, 0),
+        };
+
+        let f5 = pauses as f64;
+
+        let f6 = if self.correction_count > 0 {
+            del_followed_by_pause as f64 / self.correction_count as f64
         } else {
             0.0
         };
 
-        // --- F4: バースト長 = 連続FT<200ms のチャンクの平均文字数 ---
-        // キーリピートを除外してバースト計算する。
-        // 非タイピングキーはフック層で既にフィルタ済みのため、ここではチェック不要。
-        let mut burst_lengths: Vec<usize> = Vec::new();
+        Features {
+            f1_flight_time_median: f1,
+            f3_correction_rate: f3,
+            f4_burst_length: f4,
+            f5_pause_count: f5,
+            f6_pause_after_del_rate: f6,
+        }
+    }
+
+    /// mean_burst_length() の走査をせずに F4 = 1.0 と確定できるか。
+    ///
+    /// 走査でバーストが伸びるのは、直前のリリースがウィンドウ内にある非リピート押下の
+    /// FT が 200ms 未満のときだけ。そうした押下は FT < MAX_FLIGHT_MS なら flight_times に、
+    /// 時刻が逆行していれば (走査では FT=0 扱い) backward_flights に入っている。
+    /// どちらにも短い FT が無ければバーストはすべて長さ1で、
+    /// flight_times が空でなければ非リピート押下が少なくとも1つあるので平均は 1 になる。
+    fn bursts_all_single(&self) -> bool {
+        !self.flight_times.is_empty()
+            && self.backward_flights.is_empty()
+            && self.ft_median.count_below(BURST_FT_MS) == 0
+    }
+
+    /// F4: バッファを走査し、連続FT<200ms のチャンクの平均文字数を求める。
+    /// キーリピートを除外してバースト計算する。
+    /// 非タイピングキーはフック層で既にフィルタ済みのため、ここではチェック不要。
+    /// 平均だけが必要なので、確定したバーストは (合計文字数, 個数) に畳み込む。
+    fn mean_burst_length(&self) -> f64 {
+        let mut burst_total: usize = 0;
+        let mut burst_count: usize = 0;
         let mut current_burst: usize = 0;
         let mut last_rel_for_burst: Option<u64> = None;
 
-        for event in &events {
+        for event in &self.buffer {
             if event.is_repeat {
                 continue;
             }
             if event.is_press {
                 if let Some(rel) = last_rel_for_burst {
                     let ft = event.timestamp.saturating_sub(rel);
-                    if ft < 200 {
+                    if ft < BURST_FT_MS {
                         current_burst += 1;
                     } else {
                         if current_burst > 0 {
-                            burst_lengths.push(current_burst);
+                            burst_total += current_burst;
+                            burst_count += 1;
                         }
                         current_burst = 1;
                     }
@@ -181,50 +417,14 @@ impl FeatureExtractor {
             }
         }
         if current_burst > 0 {
-            burst_lengths.push(current_burst);
+            burst_total += current_burst;
+            burst_count += 1;
         }
 
-        let f4 = if !burst_lengths.is_empty() {
-            burst_lengths.iter().sum::<usize>() as f64 / burst_lengths.len() as f64
+        if burst_count > 0 {
+            burst_total as f64 / burst_count as f64
         } else {
             0.0
-        };
-
-        // --- F5: ポーズ回数 = 連続キー押下間で2秒以上の間隔の数 ---
-        let press_ts: Vec<u64> = events.iter()
-            .filter(|e| e.is_press)
-            .map(|e| e.timestamp)
-            .collect();
-
-        let f5 = press_ts.windows(2)
-            .filter(|w| w[1].saturating_sub(w[0]) >= 2000)
-            .count() as f64;
-
-        // --- F6: 削除後停止率 = BS/Del直後に2秒以上停止する割合 ---
-        let del_count = press_events.iter()
-            .filter(|e| e.is_backspace)
-            .count();
-
-        // 連続するキー押下ペアで、先頭がBS/Del かつ間隔>=2sのものを数える
-        let del_followed_by_pause = press_ts.windows(2).zip(press_events.windows(2))
-            .filter(|(ts_win, ev_win)| {
-                let long_pause = ts_win[1].saturating_sub(ts_win[0]) >= 2000;
-                ev_win[0].is_backspace && long_pause
-            })
-            .count();
-
-        let f6 = if del_count > 0 {
-            del_followed_by_pause as f64 / del_count as f64
-        } else {
-            0.0
-        };
-
-        Features {
-            f1_flight_time_median: f1,
-            f3_correction_rate: f3,
-            f4_burst_length: f4,
-            f5_pause_count: f5,
-            f6_pause_after_del_rate: f6,
         }
     }
 
@@ -283,3 +483,349 @@ impl FeatureExtractor {
         })
     }
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    struct Rng(u64);
+
+    impl Rng {
+        fn next(&mut self) -> u64 {
+            self.0 ^= self.0 << 13;
+            self.0 ^= self.0 >> 7;
+            self.0 ^= self.0 << 17;
+            self.0
+        }
+    }
+
+    fn as_array(f: &Features) -> [f64; 5] {
+        [
+            f.f1_flight_time_median,
+            f.f3_correction_rate,
+            f.f4_burst_length,
+            f.f5_pause_count,
+            f.f6_pause_after_del_rate,
+        ]
+    }
+
+    /// 度数木の中身を昇順に並べた値と、素朴に求めた中央値を照合する
+    fn assert_median_tree(tree: &FlightTimeMedian, sorted: &[u64]) {
+        assert_eq!(tree.len, sorted.len());
+        for (k, &v) in sorted.iter().enumerate() {
+            assert_eq!(tree.kth(k), v, "kth({})", k);
+        }
+        let expected = match sorted.len() {
+            0 => None,
+            n if n % 2 == 0 => Some((sorted[n / 2 - 1] + sorted[n / 2]) as f64 / 2.0),
+            n => Some(sorted[n / 2] as f64),
+        };
+        assert_eq!(tree.median(), expected);
+    }
+
+    #[test]
+    fn median_tree_covers_flight_time_range() {
+        assert!(FlightTimeMedian::SIZE.is_power_of_two());
+        assert!(FlightTimeMedian::SIZE as u64 >= MAX_FLIGHT_MS);
+    }
+
+    #[test]
+    fn median_tree_odd_and_even_counts() {
+        let mut tree = FlightTimeMedian::new();
+        assert_median_tree(&tree, &[]);
+        tree.insert(120);
+        assert_median_tree(&tree, &[120]);
+        tree.insert(80);
+        assert_median_tree(&tree, &[80, 120]);
+        tree.insert(300);
+        assert_median_tree(&tree, &[80, 120, 300]);
+        tree.insert(301);
+        assert_median_tree(&tree, &[80, 120, 300, 301]);
+        assert_eq!(tree.median(), Some(210.0));
+    }
+
+    #[test]
+    fn median_tree_duplicates_and_range_ends() {
+        let mut tree = FlightTimeMedian::new();
+        for ft in [0, 0, MAX_FLIGHT_MS - 1, 150, 150, 150, MAX_FLIGHT_MS - 1] {
+            tree.insert(ft);
+        }
+        assert_median_tree(&tree, &[0, 0, 150, 150, 150, 1999, 1999]);
+        assert_eq!(tree.count_below(0), 0);
+        assert_eq!(tree.count_below(1), 2);
+        assert_eq!(tree.count_below(150), 2);
+        assert_eq!(tree.count_below(151), 5);
+        assert_eq!(tree.count_below(MAX_FLIGHT_MS - 1), 5);
+        assert_eq!(tree.count_below(MAX_FLIGHT_MS), 7);
+        assert_eq!(tree.count_below(u64::MAX), 7);
+    }
+
+    #[test]
+    fn median_tree_insert_remove_round_trip() {
+        let mut rng = Rng(7);
+        let mut tree = FlightTimeMedian::new();
+        let mut values: Vec<u64> = Vec::new();
+        for _ in 0..2000 {
+            if values.is_empty() || rng.next() % 3 != 0 {
+                let ft = rng.next() % MAX_FLIGHT_MS;
+                tree.insert(ft);
+                values.push(ft);
+            } else {
+                let ft = values.swap_remove((rng.next() % values.len() as u64) as usize);
+                tree.remove(ft);
+            }
+            let mut sorted = values.clone();
+            sorted.sort_unstable();
+            assert_median_tree(&tree, &sorted);
+        }
+        for ft in values.drain(..) {
+            tree.remove(ft);
+        }
+        assert!(tree.tree.iter().all(|&c| c == 0));
+        assert_eq!(tree.median(), None);
+    }
+
+    /// 打鍵列を生成する。`backward` のときは時計の巻き戻しを混ぜる。
+    /// `slow` のときは間隔を 200ms 以上中心にし、F4 の短絡 (bursts_all_single) を通す。
+    fn random_stream(seed: u64, len: usize, backward: bool, slow: bool) -> Vec<InputEvent> {
+        let mut rng = Rng(seed.wrapping_mul(0x9E37_79B9_7F4A_7C15) | 1);
+        let mut t: u64 = 1_000_000;
+        (0..len)
+            .map(|_| {
+                match rng.next() % 20 {
+                    0 => t += rng.next() % 8000,
+                    1..=4 => t += rng.next() % 2500,
+                    5 if backward => t = t.saturating_sub(rng.next() % 3000),
+                    6 => t += rng.next() % 200,
+                    _ if slow => t += 200 + rng.next() % 1500,
+                    _ => t += rng.next() % 250,
+                }
+                let is_press = rng.next() % 2 == 0;
+                InputEvent {
+                    vk_code: 0x41,
+                    timestamp: t,
+                    is_press,
+                    is_repeat: is_press && rng.next() % 15 == 0,
+                    is_backspace: rng.next() % 6 == 0,
+                }
+            })
+            .collect()
+    }
+
+    /// process_event() と同じ到着順の規則でウィンドウを切り出す参照実装
+    struct ReferenceWindow {
+        events: Vec<InputEvent>,
+        start: usize,
+        capacity: usize,
+    }
+
+    impl ReferenceWindow {
+        fn push(&mut self, event: InputEvent) {
+            self.events.push(event);
+            let cutoff = event.timestamp.saturating_sub(WINDOW_MS);
+            while self.events.len() - self.start > self.capacity
+                || self.events[self.start].timestamp < cutoff
+            {
+                self.start += 1;
+            }
+        }
+
+        fn window(&self) -> &[InputEvent] {
+            &self.events[self.start..]
+        }
+    }
+
+    /// ウィンドウ全体を毎回走査する素朴な実装 (インクリメンタル化前の算出方法)
+    fn brute_force(window: &[InputEvent]) -> Features {
+        let mut fts: Vec<u64> = Vec::new();
+        let mut last_release: Option<u64> = None;
+        for e in window.iter().filter(|e| !e.is_repeat) {
+            if e.is_press {
+                if let Some(rel) = last_release {
+                    if e.timestamp >= rel && e.timestamp - rel < MAX_FLIGHT_MS {
+                        fts.push(e.timestamp - rel);
+                    }
+                }
+            } else {
+                last_release = Some(e.timestamp);
+            }
+        }
+        fts.sort_unstable();
+        let f1 = match fts.len() {
+            0 => 0.0,
+            n if n % 2 == 0 => (fts[n / 2 - 1] + fts[n / 2]) as f64 / 2.0,
+            n => fts[n / 2] as f64,
+        };
+
+        let presses: Vec<&InputEvent> = window.iter().filter(|e| e.is_press).collect();
+        let corrections = presses.iter().filter(|e| e.is_backspace).count();
+        let f3 = if presses.is_empty() {
+            0.0
+        } else {
+            corrections as f64 / presses.len() as f64
+        };
+
+        let mut bursts: Vec<usize> = Vec::new();
+        let mut current = 0;
+        let mut last_rel: Option<u64> = None;
+        for e in window.iter().filter(|e| !e.is_repeat) {
+            if e.is_press {
+                match last_rel {
+                    Some(rel) if e.timestamp.saturating_sub(rel) < BURST_FT_MS => current += 1,
+                    Some(_) => {
+                        if current > 0 {
+                            bursts.push(current);
+                        }
+                        current = 1;
+                    }
+                    None => current = 1,
+                }
+            } else {
+                last_rel = Some(e.timestamp);
+            }
+        }
+        if current > 0 {
+            bursts.push(current);
+        }
+        let f4 = if bursts.is_empty() {
+            0.0
+        } else {
+            bursts.iter().sum::<usize>() as f64 / bursts.len() as f64
+        };
+
+        let long_pause = |w: &[&InputEvent]| w[1].timestamp.saturating_sub(w[0].timestamp) >= 2000;
+        let pauses = presses.windows(2).filter(|w| long_pause(w)).count();
+        let del_pauses = presses
+            .windows(2)
+            .filter(|w| w[0].is_backspace && long_pause(w))
+            .count();
+        let f6 = if corrections > 0 {
+            del_pauses as f64 / corrections as f64
+        } else {
+            0.0
+        };
+
+        Features {
+            f1_flight_time_median: f1,
+            f3_correction_rate: f3,
+            f4_burst_length: f4,
+            f5_pause_count: pauses as f64,
+            f6_pause_after_del_rate: f6,
+        }
+    }
+
+    /// 差分検証を行い、F4 の短絡が成立した回数を返す
+    fn assert_matches_brute_force(backward: bool, slow: bool) -> usize {
+        let mut shortcuts = 0;
+        for seed in 1..60 {
+            let capacity = [40, 500, 5000][seed as usize % 3];
+            let mut extractor = FeatureExtractor::new(capacity);
+            let mut reference = ReferenceWindow { events: Vec::new(), start: 0, capacity };
+            for (i, event) in random_stream(seed, 2000, backward, slow).into_iter().enumerate() {
+                extractor.process_event(event);
+                reference.push(event);
+                assert_eq!(extractor.buffer.len(), reference.window().len());
+                let expected = as_array(&brute_force(reference.window()));
+                assert_eq!(
+                    as_array(&extractor.calculate_features()),
+                    expected,
+                    "seed {} event {}",
+                    seed,
+                    i
+                );
+                // キャッシュからの2回目も同じ値
+                assert_eq!(as_array(&extractor.calculate_features()), expected);
+                if extractor.bursts_all_single() {
+                    assert_eq!(extractor.mean_burst_length(), 1.0, "seed {} event {}", seed, i);
+                    shortcuts += 1;
+                }
+            }
+            extractor.reset();
+            assert_eq!(as_array(&extractor.calculate_features()), [0.0; 5]);
+        }
+        shortcuts
+    }
+
+    #[test]
+    fn incremental_matches_brute_force() {
+        assert_matches_brute_force(false, false);
+    }
+
+    #[test]
+    fn incremental_matches_brute_force_with_backward_timestamps() {
+        assert_matches_brute_force(true, false);
+    }
+
+    #[test]
+    fn incremental_matches_brute_force_slow_typing() {
+        assert!(assert_matches_brute_force(false, true) > 0);
+        assert!(assert_matches_brute_force(true, true) > 0);
+    }
+
+    fn press(timestamp: u64) -> InputEvent {
+        InputEvent {
+            vk_code: 0x41,
+            timestamp,
+            is_press: true,
+            is_repeat: false,
+            is_backspace: false,
+        }
+    }
+
+    fn repeat(timestamp: u64) -> InputEvent {
+        InputEvent { is_repeat: true, ..press(timestamp) }
+    }
+
+    fn release(timestamp: u64) -> InputEvent {
+        InputEvent { is_press: false, ..press(timestamp) }
+    }
+
+    fn extractor_with(events: &[InputEvent]) -> FeatureExtractor {
+        let mut extractor = FeatureExtractor::new(1000);
+        for &event in events {
+            extractor.process_event(event);
+        }
+        extractor
+    }
+
+    #[test]
+    fn burst_shortcut_with_unreleased_first_press_and_repeat() {
+        // 先頭の押下は直前のリリースが無く、リピート押下は直前リリースから 10ms。
+        // どちらもバーストを伸ばさないので短絡が成立し、走査結果と一致する。
+        let events = [
+            press(1000),
+            release(1080),
+            press(1600),
+            repeat(1610),
+            release(1700),
+            press(2000),
+            release(2090),
+        ];
+        let mut extractor = extractor_with(&events);
+        assert!(extractor.bursts_all_single());
+        assert_eq!(extractor.mean_burst_length(), 1.0);
+        assert_eq!(as_array(&extractor.calculate_features()), as_array(&brute_force(&events)));
+    }
+
+    #[test]
+    fn burst_shortcut_declines_short_and_backward_flights() {
+        // FT 150ms の押下でバースト長 2 になる
+        let short = [press(1000), release(1080), press(1230), release(1300)];
+        let extractor = extractor_with(&short);
+        assert!(!extractor.bursts_all_single());
+        assert_eq!(extractor.mean_burst_length(), 2.0);
+
+        // 直前のリリースより時刻が戻った押下は走査では FT=0 としてバーストを伸ばす
+        let backward = [press(1000), release(1500), press(3000), release(3100), press(2900)];
+        let extractor = extractor_with(&backward);
+        assert!(!extractor.backward_flights.is_empty());
+        assert!(!extractor.bursts_all_single());
+        assert_eq!(extractor.mean_burst_length(), 1.5);
+
+        // リピート押下と未リリースの押下だけでは flight_times が空なので走査に回す
+        let unreleased = [press(1000), repeat(1030), repeat(1060)];
+        let mut extractor = extractor_with(&unreleased);
+        assert!(!extractor.bursts_all_single());
+        assert_eq!(extractor.calculate_features().f4_burst_length, 1.0);
+    }
+}
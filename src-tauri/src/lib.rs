@@ -5,7 +5,7 @@ pub mod sensors;
 pub mod wall_server;
 
 use crate::analysis::{
-    engine::{CognitiveState, CognitiveStateEngine},
+    engine::CognitiveStateEngine,
     features::FeatureExtractor,
 };
 use crate::logger::{LogEntry, SessionLogger};
@@ -48,16 +48,12 @@ struct LogState {
 
 #[tauri::command]
 fn get_cognitive_state(state: State<CognitiveStateEngine>) -> HashMap<String, f64> {
-    let probs = state.get_current_state();
-    let mut map = HashMap::new();
-    for (k, v) in probs {
-        let key_str = match k {
-            CognitiveState::Flow => "flow",
-            CognitiveState::Incubation => "incubation",
-            CognitiveState::Stuck => "stuck",
-        };
-        map.insert(key_str.to_string(), v);
-    }
+    // 中間の HashMap<CognitiveState, f64> を経由せず、スナップショットから直接組み立てる
+    let [flow, incubation, stuck] = state.display_probs();
+    let mut map = HashMap::with_capacity(3);
+    map.insert("flow".to_string(), flow);
+    map.insert("incubation".to_string(), incubation);
+    map.insert("stuck".to_string(), stuck);
     map
 }
 
@@ -196,30 +192,38 @@ fn quit_app(app: tauri::AppHandle, log: State<Arc<Mutex<LogState>>>, wall: State
         // ロガースレッドの終了を確実に待機（最大2秒）
         let _ = shutdown_rx.recv_timeout(std::time::Duration::from_secs(2));
 
-        // behavioral_gt.py を探して実行
-        match find_behavioral_gt() {
-            Some(script) => {
-                tracing::info!(
-                    "Auto-analysis: python {:?} {}",
-                    script,
-                    session_path
-                );
-                match std::process::Command::new("python")
-                    .args([script.to_str().unwrap_or(""), &session_path])
-                    .spawn()
-                {
-                    Ok(_) => tracing::info!("behavioral_gt.py launched"),
-                    Err(e) => tracing::warn!("Failed to launch behavioral_gt.py: {}", e),
+        // behavioral_gt.py を探して実行 (GSE_NO_AUTO_ANALYSIS 指定時は起動も待機もしない)
+        if auto_analysis_disabled() {
+            tracing::info!(
+                "GSE_NO_AUTO_ANALYSIS set. Skipping auto-analysis. \
+                 Run manually: python analysis/behavioral_gt.py {}",
+                session_path
+            );
+        } else {
+            match find_behavioral_gt() {
+                Some(script) => {
+                    tracing::info!(
+                        "Auto-analysis: python {:?} {}",
+                        script,
+                        session_path
+                    );
+                    match std::process::Command::new("python")
+                        .args([script.to_str().unwrap_or(""), &session_path])
+                        .spawn()
+                    {
+                        Ok(_) => tracing::info!("behavioral_gt.py launched"),
+                        Err(e) => tracing::warn!("Failed to launch behavioral_gt.py: {}", e),
+                    }
+                    // Python 分析に少し時間を与えてから Explorer を開く
+                    thread::sleep(std::time::Duration::from_millis(1500));
+                }
+                None => {
+                    tracing::warn!(
+                        "behavioral_gt.py not found. Skipping auto-analysis. \
+                         Run manually: python analysis/behavioral_gt.py {}",
+                        session_path
+                    );
                 }
-                // Python 分析に少し時間を与えてから Explorer を開く
-                thread::sleep(std::time::Duration::from_millis(1500));
-            }
-            None => {
-                tracing::warn!(
-                    "behavioral_gt.py not found. Skipping auto-analysis. \
-                     Run manually: python analysis/behavioral_gt.py {}",
-                    session_path
-                );
             }
         }
 
@@ -234,6 +238,16 @@ fn quit_app(app: tauri::AppHandle, log: State<Arc<Mutex<LogState>>>, wall: State
     });
 }
 
+// ---------------------------------------------------------------------------
+// 終了時の自動分析
+// ---------------------------------------------------------------------------
+
+/// 環境変数 GSE_NO_AUTO_ANALYSIS が設定されていれば終了時の自動分析をスキップする。
+/// ヘッドレス計測やバッチ実行で Python 起動と 1.5 秒の待機を省くためのオプトアウト。
+fn auto_analysis_disabled() -> bool {
+    std::env::var_os("GSE_NO_AUTO_ANALYSIS").is_some_and(|v| !v.is_empty() && v != "0")
+}
+
 // ---------------------------------------------------------------------------
 // behavioral_gt.py の場所を探す
 // ---------------------------------------------------------------------------
@@ -367,6 +381,10 @@ pub fn run() {
 
                     extractor.process_event(event);
 
+                    // 時刻はイベントごとに1回だけ取得し、以下の沈黙判定・タイマー更新で共有する
+                    let now = Instant::now();
+                    let since_last_event = now.saturating_duration_since(last_event_time);
+
                     // キーイベントをログ記録（全打鍵を記録、推論頻度とは独立）
                     let _ = log_tx_analysis.try_send(LogEntry::Key {
                         vk_code: event.vk_code,
@@ -384,19 +402,19 @@ pub fn run() {
                         // 深い沈黙（>10秒）中は、単発キーで last_event_time をリセットせず、
                         // 3回以上の連続打鍵で初めてリセットする。
                         // これにより、Stuck状態の合成摩擦値 (f3, f6) が1打鍵で消失するのを防ぐ。
-                        if last_event_time.elapsed() > Duration::from_secs(10) {
+                        if since_last_event > Duration::from_secs(10) {
                             presses_since_silence += 1;
                             if presses_since_silence >= 3 {
-                                last_event_time = Instant::now();
+                                last_event_time = now;
                                 presses_since_silence = 0;
                             }
                         } else {
-                            last_event_time = Instant::now();
+                            last_event_time = now;
                             presses_since_silence = 0;
                         }
-                    } else if last_event_time.elapsed() <= Duration::from_secs(10) {
+                    } else if since_last_event <= Duration::from_secs(10) {
                         // Release events: 深い沈黙中でなければタイマーを更新
-                        last_event_time = Instant::now();
+                        last_event_time = now;
                     }
                 }
 
@@ -430,7 +448,7 @@ pub fn run() {
 
                 // IMEモード（あ/A）はポーリングスレッドが100ms毎に更新するAtomicBoolを読む。
                 let ime_open = input::hook::IME_OPEN.load(Ordering::Relaxed);
-                let silence_secs = last_event_time.elapsed().as_secs_f64();
+                let silence_secs = now.saturating_duration_since(last_event_time).as_secs_f64();
 
                 // Fix 1: バッファの実データを優先し、空の場合のみサイレンス観測にフォールバック。
                 // 直近30秒に有効な打鍵データ (f1 > 0) がある場合は実特徴量で HMM を更新する。
@@ -481,19 +499,7 @@ pub fn run() {
                 };
 
                 // 特徴量 + 状態確率をログ記録
-                let state_probs = engine_for_thread.get_current_state();
-                let p_flow = state_probs
-                    .get(&CognitiveState::Flow)
-                    .copied()
-                    .unwrap_or(0.0);
-                let p_inc = state_probs
-                    .get(&CognitiveState::Incubation)
-                    .copied()
-                    .unwrap_or(0.0);
-                let p_stuck = state_probs
-                    .get(&CognitiveState::Stuck)
-                    .copied()
-                    .unwrap_or(0.0);
+                let [p_flow, p_inc, p_stuck] = engine_for_thread.display_probs();
 
                 let now_ts = SystemTime::now()
                     .duration_since(UNIX_EPOCH)
@@ -55,9 +55,11 @@ impl WallServer {
             .map(|addr| addr.port())
             .ok_or("Failed to get server port")?;
 
+        // ローカルIPは起動時に1回だけ検出し、サーバースレッドにも同じ URL を渡す
         let local_ip = detect_local_ip();
+        let server_url = format!("http://{}:{}", local_ip, port);
         let token = generate_token();
-        let url = format!("http://{}:{}/shake?token={}", local_ip, port, token);
+        let url = format!("{}/shake?token={}", server_url, token);
 
         tracing::info!("WallServer: started on {}:{} (token={}...)", local_ip, port, &token[..8]);
 
@@ -74,7 +76,7 @@ impl WallServer {
         let server_arc = Arc::new(server);
 
         let handle = thread::spawn(move || {
-            server_loop(server_arc, token, shutdown_clone, app);
+            server_loop(server_arc, token, server_url, shutdown_clone, app);
         });
 
         let info_for_return = info_clone.clone();
@@ -106,18 +108,10 @@ impl WallServer {
 fn server_loop<R: Runtime>(
     server: Arc<Server>,
     token: String,
+    server_url: String,
     shutdown: Arc<AtomicBool>,
     app: tauri::AppHandle<R>,
 ) {
-    // Build the server URL for embedding in the HTML page
-    let port = server
-        .server_addr()
-        .to_ip()
-        .map(|addr| addr.port())
-        .unwrap_or(0);
-    let local_ip = detect_local_ip();
-    let server_url = format!("http://{}:{}", local_ip, port);
-
     // PC側の自動アンロックなし — スマホからの POST /unlock のみで解除
     loop {
         if shutdown.load(Ordering::Acquire) {